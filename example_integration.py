@@ -3,96 +3,185 @@ Example integration of Deepgram live transcription with SmolLM2 summarization.
 This shows how to combine the transcript.py script with the summarizer.
 """
 
-from deepgram import DeepgramClient
+import asyncio
+import logging
+import logging.handlers
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import requests
+from requests.adapters import HTTPAdapter
+from deepgram import AsyncDeepgramClient
 from deepgram.core.events import EventType
 from urllib.parse import urljoin
 import os
-import subprocess
-import threading
 from transcript_summarizer import TranscriptSummarizer
 
 
-# Load API key from environment
+# Route all logging through a queue so the transcription callback only
+# enqueues records; a dedicated listener thread does the actual stdout
+# writes and absorbs any TTY backpressure.
+_log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+_log_listener = logging.handlers.QueueListener(
+    _log_queue, logging.StreamHandler()
+)
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(message)s",
+    handlers=[logging.handlers.QueueHandler(_log_queue)]
+)
+_log_listener.start()
+
+logger = logging.getLogger(__name__)
+
+
+# Load API key and webhook URL from environment
 DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
+N8N_WEBHOOK_URL = os.getenv("N8N_WEBHOOK_URL")
 
 # Initialize the transcript summarizer
 # Summaries will be generated every 60 seconds
 summarizer = TranscriptSummarizer(summary_interval=60)
 
+# Shared session keeps the TCP/TLS connection to n8n open between
+# summaries, and the small executor posts in the background so the
+# summary loop never waits on the webhook round trip.
+_webhook_session = requests.Session()
+_webhook_session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+_webhook_executor = ThreadPoolExecutor(max_workers=2)
+
+
+def _post_summary(summary: str):
+    """Deliver one summary to the n8n webhook (runs on the executor)."""
+    try:
+        _webhook_session.post(
+            N8N_WEBHOOK_URL,
+            json={"summary": summary, "timestamp": datetime.now().isoformat()},
+            timeout=5
+        )
+    except requests.RequestException as e:
+        logger.error("[n8n] Webhook delivery failed: %s", e)
+
 
 def n8n_webhook_callback(summary: str):
     """
     Callback function to send summaries to n8n webhook.
-    Replace with your actual n8n webhook URL.
+    Set N8N_WEBHOOK_URL to your actual n8n webhook URL.
     """
-    # Uncomment and configure when ready:
-    # import requests
-    # webhook_url = "https://your-n8n-instance.com/webhook/summaries"
-    # requests.post(webhook_url, json={"summary": summary, "timestamp": datetime.now().isoformat()})
-    print(f"[n8n] Would send summary to webhook: {summary[:50]}...")
-
-
-# Set the callback for n8n integration
-summarizer.set_summary_callback(n8n_webhook_callback)
-
-# Start the summarizer
-summarizer.start()
-
-# Initialize Deepgram client
-client = DeepgramClient(api_key=DEEPGRAM_API_KEY)
-
-with client.listen.v2.connect(
-    model="flux-general-en",
-    encoding="linear16",
-    sample_rate=16000,
-) as connection:
-    ready = threading.Event()
-    
-    def on_message(result):
-        """Handle incoming transcript messages."""
-        event = getattr(result, "event", None)
-        turn_index = getattr(result, "turn_index", None)
-        eot_confidence = getattr(result, "end_of_turn_confidence", None)
-        
-        if event == "StartOfTurn":
-            print(f"--- StartOfTurn (Turn {turn_index}) ---")
-        
-        transcript = getattr(result, "transcript", None)
-        if transcript:
-            print(transcript)
-            # Add transcript to summarizer buffer
-            summarizer.add_transcript(transcript)
-        
-        if event == "EndOfTurn":
-            print(f"--- EndOfTurn (Turn {turn_index}, Confidence: {eot_confidence}) ---")
-    
-    connection.on(EventType.OPEN, lambda _: ready.set())
-    connection.on(EventType.MESSAGE, on_message)
-    
-    # Start audio stream (example with CSPAN Radio)
-    ffmpeg = subprocess.Popen([
-        "ffmpeg", "-loglevel", "quiet", "-i",
-        urljoin("https://playerservices.streamtheworld.com",
-                "/api/livestream-redirect/CSPANRADIOAAC.aac"),
-        "-f", "s16le", "-ar", "16000", "-ac", "1", "-"
-    ], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
-    
-    def stream():
-        """Stream audio data to Deepgram."""
-        ready.wait()
-        while data := ffmpeg.stdout.read(2560):
-            connection.send_media(data)
-    
-    threading.Thread(target=stream, daemon=True).start()
-    
-    print("Transcribing audio stream...")
-    print("Summaries will be generated every 60 seconds.")
-    print("Press Ctrl+C to stop.\n")
-    
+    if not N8N_WEBHOOK_URL:
+        logger.info("[n8n] Would send summary to webhook: %s...", summary[:50])
+        return
+    _webhook_executor.submit(_post_summary, summary)
+
+
+def _widen_pipe(stream):
+    """On Linux, widen the kernel pipe behind an asyncio subprocess stream."""
     try:
-        connection.start_listening()
-    except KeyboardInterrupt:
-        print("\nStopping...")
-        summarizer.stop()
-        ffmpeg.terminate()
+        import fcntl
+        F_SETPIPE_SZ = 1031
+        pipe = stream._transport.get_extra_info("pipe")
+        fcntl.fcntl(pipe.fileno(), F_SETPIPE_SZ, 1 << 20)
+    except (ImportError, AttributeError, OSError):
+        pass
+
+
+async def main():
+    # Set the callback for n8n integration
+    summarizer.set_summary_callback(n8n_webhook_callback)
+
+    # Start the summarizer
+    summarizer.start()
+
+    # Initialize Deepgram client
+    client = AsyncDeepgramClient(api_key=DEEPGRAM_API_KEY)
+
+    async with client.listen.v2.connect(
+        model="flux-general-en",
+        encoding="linear16",
+        sample_rate=16000,
+    ) as connection:
+        ready = asyncio.Event()
+        current_turn_text = ""
+
+        async def on_open(_):
+            ready.set()
 
+        async def on_message(result):
+            """Handle incoming transcript messages."""
+            nonlocal current_turn_text
+            event = getattr(result, "event", None)
+            turn_index = getattr(result, "turn_index", None)
+            eot_confidence = getattr(result, "end_of_turn_confidence", None)
+
+            if event == "StartOfTurn":
+                logger.info("--- StartOfTurn (Turn %s) ---", turn_index)
+
+            transcript = getattr(result, "transcript", None)
+            if transcript:
+                logger.info(transcript)
+                # Flux revises the turn's transcript as audio arrives; keep
+                # only the latest revision instead of buffering every
+                # partial, so duplicates never reach the model prompt.
+                current_turn_text = transcript
+
+            if event == "EndOfTurn" or getattr(result, "is_final", False):
+                if current_turn_text:
+                    await summarizer.add_transcript(current_turn_text)
+                    current_turn_text = ""
+
+            if event == "EndOfTurn":
+                logger.info(
+                    "--- EndOfTurn (Turn %s, Confidence: %s) ---",
+                    turn_index, eot_confidence
+                )
+
+        connection.on(EventType.OPEN, on_open)
+        connection.on(EventType.MESSAGE, on_message)
+
+        # Start audio stream (example with CSPAN Radio)
+        # A 64KB reader limit means each 2560-byte read is served from
+        # userspace instead of costing a syscall per 80ms audio frame.
+        ffmpeg = await asyncio.create_subprocess_exec(
+            "ffmpeg", "-loglevel", "quiet", "-i",
+            urljoin("https://playerservices.streamtheworld.com",
+                    "/api/livestream-redirect/CSPANRADIOAAC.aac"),
+            "-f", "s16le", "-ar", "16000", "-ac", "1", "-",
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            limit=1 << 16,
+        )
+
+        # Widen the kernel pipe as well so ffmpeg can stay ahead of the
+        # sender without blocking on a 64KB default pipe.
+        _widen_pipe(ffmpeg.stdout)
+
+        async def stream_audio():
+            """Stream audio data to Deepgram."""
+            await ready.wait()
+            # 640 bytes is one 20ms linear16 frame at 16kHz, Deepgram's
+            # latency sweet spot. The reads are cheap slices out of the
+            # 64KB reader buffer, not per-frame syscalls.
+            while data := await ffmpeg.stdout.read(640):
+                await connection.send_media(data)
+
+        stream_task = asyncio.create_task(stream_audio())
+
+        logger.info("Transcribing audio stream...")
+        logger.info("Summaries will be generated every 60 seconds.")
+        logger.info("Press Ctrl+C to stop.\n")
+
+        try:
+            await connection.start_listening()
+        finally:
+            stream_task.cancel()
+            await summarizer.stop()
+            ffmpeg.terminate()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        logger.info("\nStopping...")
+    finally:
+        _log_listener.stop()
@@ -1,124 +1,301 @@
 """
 Summarization module using SmolLM2 Docker model.
-This module loads and uses the ai/smollm2:135M-Q4_K_M Docker model
-for generating concise summaries (max 3 sentences) from transcripts.
+This module talks to the ai/smollm2:135M-Q4_K_M model through Docker Model
+Runner's OpenAI-compatible endpoint, keeping the model loaded between calls
+so each summary only pays inference cost (max 3 sentences per summary).
 """
 
 import subprocess
-import json
+import time
 import re
-from typing import Optional
+from typing import List, Optional, Set, Tuple
+
+import httpx
+from openai import OpenAI, OpenAIError
+
+
+# Docker Model Runner exposes an OpenAI-compatible API on this endpoint
+# when host-side TCP access is enabled (docker desktop settings or
+# `docker model install-runner`).
+DEFAULT_BASE_URL = "http://localhost:12434/engines/v1"
+
+# Sentence endings (period, exclamation, question mark) followed by whitespace
+_SENT_RE = re.compile(r'[.!?]+\s+')
+
+# Keep prompts inside the model's context window: only the most recent
+# MAX_PROMPT_TOKENS of transcript are sent, so a backfilled or forced
+# window cannot blow up inference time.
+MAX_PROMPT_TOKENS = 1500
+# Rough characters-per-token estimate for the fallback when no tokenizer
+# is installed
+_CHARS_PER_TOKEN = 4
+# Hugging Face tokenizer matching the SmolLM2 Docker model
+_TOKENIZER_NAME = "HuggingFaceTB/SmolLM2-135M-Instruct"
 
 
 class SmolLM2Summarizer:
     """Wrapper for the SmolLM2 Docker model for text summarization."""
-    
-    def __init__(self, model_name: str = "ai/smollm2:135M-Q4_K_M"):
+
+    # Endpoint/model pairs already confirmed available, shared across
+    # instances so repeated construction (tests, reconnects) skips the check.
+    _verified: Set[Tuple[str, str]] = set()
+
+    def __init__(
+        self,
+        model_name: str = "ai/smollm2:135M-Q4_K_M",
+        base_url: str = DEFAULT_BASE_URL
+    ):
         """
         Initialize the summarizer with a Docker model.
-        
+
         Args:
             model_name: Docker model identifier
+            base_url: OpenAI-compatible endpoint of the model server
         """
         self.model_name = model_name
+        self.base_url = base_url
+        self._started_model = False
+        # One shared HTTP client for the life of the summarizer: connections
+        # stay keep-alive across summaries and the TLS/transport setup cost
+        # is paid once, not per call. httpx.Client is thread-safe, so the
+        # instance can be used from worker threads as-is.
+        self._http = httpx.Client(
+            timeout=30,
+            limits=httpx.Limits(max_keepalive_connections=4)
+        )
+        self.client = OpenAI(
+            base_url=base_url, api_key="none", http_client=self._http
+        )
+        self._tokenizer = None
+        self._tokenizer_loaded = False
         self._verify_model_available()
-    
+
     def _verify_model_available(self):
-        """Verify that the Docker model is available."""
+        """Verify that the model server is reachable and serving the model."""
+        if (self.base_url, self.model_name) in SmolLM2Summarizer._verified:
+            return
+
+        try:
+            available = {model.id for model in self.client.models.list()}
+        except OpenAIError:
+            # Server not reachable yet: start the model in the background
+            # once, then retry. Subsequent summaries reuse the warm server.
+            self._start_model()
+            try:
+                available = {model.id for model in self.client.models.list()}
+            except OpenAIError as e:
+                raise RuntimeError(
+                    f"Could not reach model server at {self.base_url}: {e}"
+                )
+
+        if self.model_name not in available:
+            raise RuntimeError(
+                f"Model {self.model_name} not found. "
+                "Please pull it using: docker model pull ai/smollm2:135M-Q4_K_M"
+            )
+
+        SmolLM2Summarizer._verified.add((self.base_url, self.model_name))
+
+    def _start_model(self):
+        """Start the Docker model in detached mode so it stays resident."""
         try:
-            result = subprocess.run(
-                ["docker", "model", "ls"],
+            subprocess.run(
+                ["docker", "model", "run", "--detach", self.model_name],
                 capture_output=True,
                 text=True,
                 check=True
             )
-            if self.model_name not in result.stdout:
-                raise RuntimeError(
-                    f"Model {self.model_name} not found. "
-                    "Please pull it using: docker model pull ai/smollm2:135M-Q4_K_M"
-                )
         except subprocess.CalledProcessError as e:
-            raise RuntimeError(f"Failed to verify Docker model: {e}")
+            raise RuntimeError(f"Failed to start Docker model: {e.stderr}")
         except FileNotFoundError:
             raise RuntimeError("Docker is not installed or not in PATH")
-    
+
+        self._started_model = True
+        # Give the runner a moment to load the model weights
+        time.sleep(2)
+
+    def _get_tokenizer(self):
+        """Lazily load the SmolLM2 tokenizer, or None if unavailable."""
+        if not self._tokenizer_loaded:
+            self._tokenizer_loaded = True
+            try:
+                from transformers import AutoTokenizer
+                self._tokenizer = AutoTokenizer.from_pretrained(_TOKENIZER_NAME)
+            except Exception:
+                # transformers not installed or tokenizer not cached; fall
+                # back to the character-based estimate.
+                self._tokenizer = None
+        return self._tokenizer
+
+    def _truncate_to_token_budget(self, text: str, max_tokens: int = MAX_PROMPT_TOKENS) -> str:
+        """
+        Keep only the most recent max_tokens worth of text.
+
+        Args:
+            text: The text to bound
+            max_tokens: Token budget for the kept suffix
+
+        Returns:
+            The text, truncated from the front if it exceeds the budget
+        """
+        tokenizer = self._get_tokenizer()
+        if tokenizer is not None:
+            ids = tokenizer.encode(text)
+            if len(ids) <= max_tokens:
+                return text
+            return tokenizer.decode(ids[-max_tokens:], skip_special_tokens=True)
+
+        limit = max_tokens * _CHARS_PER_TOKEN
+        if len(text) <= limit:
+            return text
+        # Drop the leading partial word left by the character cut
+        return text[-limit:].split(" ", 1)[-1]
+
     def summarize(self, text: str, max_sentences: int = 3) -> str:
         """
         Generate a summary of the input text.
-        
+
         Args:
             text: The text to summarize
             max_sentences: Maximum number of sentences in the summary (default: 3)
-            
+
         Returns:
             A summarized version of the input text
         """
         if not text or not text.strip():
             return ""
-        
-        # Create a prompt that enforces the sentence limit
-        # Use a direct instruction format that works well with SmolLM2
-        prompt = (
-            f"{text}\n\nSummarize the above in {max_sentences} sentences."
-        )
-        
+
+        # Put the static instruction first, as a system message: identical
+        # across calls, it hits the server's prompt prefix cache so only the
+        # transcript itself needs prefill.
+        messages = [
+            {
+                "role": "system",
+                "content": (
+                    f"You summarize transcripts in exactly {max_sentences} "
+                    "sentences. Be concise."
+                )
+            },
+            {"role": "user", "content": self._truncate_to_token_budget(text)}
+        ]
+
         try:
-            # Run the Docker model
-            result = subprocess.run(
-                ["docker", "model", "run", self.model_name, prompt],
-                capture_output=True,
-                text=True,
-                check=True,
+            # Stream tokens from the persistent model server
+            stream = self.client.chat.completions.create(
+                model=self.model_name,
+                messages=messages,
+                stream=True,
+                max_tokens=256,
                 timeout=30  # 30 second timeout
             )
-            
-            summary = result.stdout.strip()
-            
+
+            parts = []
+            for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+
+            summary = "".join(parts).strip()
+
             # Enforce sentence limit by truncating if necessary
             summary = self._enforce_sentence_limit(summary, max_sentences)
-            
+
             return summary
-            
-        except subprocess.TimeoutExpired:
-            raise RuntimeError("Model inference timed out after 30 seconds")
-        except subprocess.CalledProcessError as e:
-            raise RuntimeError(f"Model inference failed: {e.stderr}")
-    
+
+        except OpenAIError as e:
+            raise RuntimeError(f"Model inference failed: {e}")
+
+    def summarize_batch(self, texts: List[str], max_sentences: int = 3) -> List[str]:
+        """
+        Summarize several texts with a single batched request.
+
+        Submitting all prompts together lets the model server schedule them
+        as one batch instead of running inference serially per text.
+
+        Args:
+            texts: The texts to summarize
+            max_sentences: Maximum number of sentences per summary (default: 3)
+
+        Returns:
+            One summary per input text, in the same order
+        """
+        results = [""] * len(texts)
+        indices = [i for i, text in enumerate(texts) if text and text.strip()]
+        if not indices:
+            return results
+
+        # Instruction-first for the same prefix-caching reason as
+        # summarize(): the shared leading text is cached across prompts.
+        instruction = (
+            f"Summarize the following transcript in {max_sentences} "
+            "sentences. Be concise."
+        )
+        prompts = [
+            f"{instruction}\n\n{self._truncate_to_token_budget(texts[i])}"
+            for i in indices
+        ]
+
+        try:
+            # The completions endpoint accepts a list of prompts and runs
+            # them as one batch; choices come back tagged with their index.
+            response = self.client.completions.create(
+                model=self.model_name,
+                prompt=prompts,
+                max_tokens=256,
+                timeout=30
+            )
+        except OpenAIError as e:
+            raise RuntimeError(f"Model inference failed: {e}")
+
+        for choice in response.choices:
+            summary = self._enforce_sentence_limit(
+                choice.text.strip(), max_sentences
+            )
+            results[indices[choice.index]] = summary
+
+        return results
+
+    def close(self):
+        """Release the HTTP client and stop the model if we started it."""
+        self.client.close()
+        self._http.close()
+        if self._started_model:
+            subprocess.run(
+                ["docker", "model", "stop", self.model_name],
+                capture_output=True,
+                text=True
+            )
+            self._started_model = False
+
     def _enforce_sentence_limit(self, text: str, max_sentences: int) -> str:
         """
         Enforce sentence limit by truncating text if it exceeds max_sentences.
-        
+
         Args:
             text: The text to process
             max_sentences: Maximum number of sentences allowed
-            
+
         Returns:
             Text truncated to max_sentences sentences
         """
-        # Split by sentence endings (period, exclamation, question mark)
-        sentences = re.split(r'[.!?]+\s+', text)
-        sentences = [s.strip() for s in sentences if s.strip()]
-        
-        if len(sentences) <= max_sentences:
-            return text
-        
-        # Take first max_sentences and join them
-        truncated = sentences[:max_sentences]
-        result = '. '.join(truncated)
-        
-        # Ensure it ends with proper punctuation
-        if not result.endswith(('.', '!', '?')):
-            result += '.'
-        
-        return result
-    
+        # Walk sentence boundaries lazily and stop as soon as we have seen
+        # enough: only the kept prefix of the text is ever scanned.
+        count = 0
+        for match in _SENT_RE.finditer(text):
+            count += 1
+            if count == max_sentences:
+                # Keep the punctuation but drop the trailing whitespace
+                return text[:match.end()].rstrip()
+
+        return text
+
     def summarize_transcript(self, transcript_text: str) -> str:
         """
         Summarize transcript text with a 3-sentence limit.
-        
+
         Args:
             transcript_text: The transcript text to summarize
-            
+
         Returns:
             A 3-sentence summary
         """
@@ -129,36 +306,37 @@ def main():
     """Test the summarizer with sample text."""
     print("Loading SmolLM2 model...")
     summarizer = SmolLM2Summarizer()
-    
+
     # Test with sample transcript
     sample_transcript = """
-    Speaker 1: Good morning everyone, welcome to today's meeting. We're going to discuss 
+    Speaker 1: Good morning everyone, welcome to today's meeting. We're going to discuss
     the quarterly results and our plans for the next quarter.
-    
-    Speaker 2: Thank you for having me. I'm excited to share our progress on the new product 
+
+    Speaker 2: Thank you for having me. I'm excited to share our progress on the new product
     launch. We've made significant strides in the past month.
-    
+
     Speaker 1: That's great to hear. Can you walk us through the key milestones?
-    
-    Speaker 2: Absolutely. We've completed the initial design phase, finished user testing, 
+
+    Speaker 2: Absolutely. We've completed the initial design phase, finished user testing,
     and we're now ready to begin production. The feedback has been overwhelmingly positive.
-    
+
     Speaker 1: Excellent work. What about the marketing strategy?
-    
-    Speaker 2: We've partnered with three major influencers and scheduled a launch event 
+
+    Speaker 2: We've partnered with three major influencers and scheduled a launch event
     for next month. Our social media campaign is already generating buzz.
     """
-    
+
     print("\nGenerating summary...")
     summary = summarizer.summarize_transcript(sample_transcript)
-    
+
     print("\n" + "="*60)
     print("SUMMARY (3 sentences max):")
     print("="*60)
     print(summary)
     print("="*60)
 
+    summarizer.close()
+
 
 if __name__ == "__main__":
     main()
-
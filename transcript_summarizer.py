@@ -4,142 +4,230 @@ This script combines Deepgram live transcription with SmolLM2 summarization,
 generating summaries every 1 minute from accumulated transcript text.
 """
 
-import time
-import threading
-from datetime import datetime
-from typing import List, Optional, Callable
+import asyncio
+import logging
+from collections import deque
+from typing import Deque, List, Optional, Callable
 from summarizer import SmolLM2Summarizer
 
 
+logger = logging.getLogger(__name__)
+
+# Windows shorter than this are not worth a model run (quiet intervals,
+# stray filler words); they are skipped instead of summarized.
+MIN_SUMMARY_CHARS = 200
+
+
 class TranscriptSummarizer:
     """
     Manages live transcript summarization with periodic summary generation.
+
+    Runs on the asyncio event loop so the transcription callback, the
+    summary loop, and webhook delivery share one loop instead of handing
+    work between threads through locks.
     """
-    
+
     def __init__(
         self,
         summary_interval: int = 60,  # seconds
-        summarizer: Optional[SmolLM2Summarizer] = None
+        summarizer: Optional[SmolLM2Summarizer] = None,
+        max_chunks: int = 1000
     ):
         """
         Initialize the transcript summarizer.
-        
+
         Args:
             summary_interval: Time in seconds between summaries (default: 60)
             summarizer: Optional SmolLM2Summarizer instance (creates new if None)
+            max_chunks: Maximum transcript chunks kept per window (default: 1000)
         """
         self.summary_interval = summary_interval
         self.summarizer = summarizer or SmolLM2Summarizer()
-        self.transcript_buffer: List[str] = []
-        self.buffer_lock = threading.Lock()
+        # Producers enqueue chunks; the summary loop drains into a bounded
+        # window buffer. Everything runs on one event loop, so no locks.
+        self._queue: "asyncio.Queue[str]" = asyncio.Queue()
+        self._window_parts: Deque[str] = deque(maxlen=max_chunks)
+        self._stop_event = asyncio.Event()
+        self.pending_windows: Deque[str] = deque()
+        self._last_window_hash: Optional[int] = None
+        self._last_summary = ""
         self.summary_callback: Optional[Callable[[str], None]] = None
         self.running = False
-        self.summary_thread: Optional[threading.Thread] = None
-    
-    def add_transcript(self, text: str):
+        self.summary_task: Optional[asyncio.Task] = None
+
+    async def add_transcript(self, text: str):
         """
         Add transcript text to the buffer.
-        
+
         Args:
             text: Transcript text to add
         """
         if text and text.strip():
-            with self.buffer_lock:
-                self.transcript_buffer.append(text.strip())
-    
+            self._queue.put_nowait(text.strip())
+
     def set_summary_callback(self, callback: Callable[[str], None]):
         """
         Set a callback function to be called when a summary is generated.
         Useful for n8n webhook integration.
-        
+
         Args:
             callback: Function that accepts summary text as parameter
         """
         self.summary_callback = callback
-    
-    def _generate_summary(self) -> Optional[str]:
+
+    def _drain_queue(self):
+        """Drain all enqueued chunks into the window buffer."""
+        try:
+            while True:
+                self._window_parts.append(self._queue.get_nowait())
+        except asyncio.QueueEmpty:
+            pass
+
+    def _queue_current_window(self):
+        """Move the current transcript window into the pending window queue."""
+        self._drain_queue()
+        if self._window_parts:
+            self.pending_windows.append(" ".join(self._window_parts))
+            self._window_parts.clear()
+
+    async def _generate_summary(self, windows: List[str]) -> List[str]:
         """
-        Generate a summary from the current transcript buffer.
-        
+        Generate summaries for the given transcript windows in one batch.
+
+        Windows below MIN_SUMMARY_CHARS are skipped, and a window identical
+        to the previous one (e.g. a silent stream) reuses the cached summary
+        instead of spending another model run.
+
+        Args:
+            windows: Transcript windows to summarize
+
         Returns:
-            Summary text or None if buffer is empty
+            One summary per window; skipped windows yield an empty string
         """
-        with self.buffer_lock:
-            if not self.transcript_buffer:
-                return None
-            
-            # Get all transcript text
-            full_text = " ".join(self.transcript_buffer)
-            
-            # Clear buffer after summarizing
-            self.transcript_buffer.clear()
-        
-        try:
-            summary = self.summarizer.summarize_transcript(full_text)
-            return summary
-        except Exception as e:
-            print(f"Error generating summary: {e}")
-            return None
-    
-    def _summary_loop(self):
-        """Background thread that generates summaries at regular intervals."""
-        while self.running:
-            time.sleep(self.summary_interval)
-            
-            if not self.running:
+        if not windows:
+            return []
+
+        results: List[str] = []
+        run_windows: List[str] = []
+        run_indices: List[int] = []
+        for i, window in enumerate(windows):
+            if len(window) < MIN_SUMMARY_CHARS:
+                results.append("")
+            elif self._last_summary and hash(window) == self._last_window_hash:
+                results.append(self._last_summary)
+            else:
+                results.append("")
+                run_windows.append(window)
+                run_indices.append(i)
+
+        if run_windows:
+            try:
+                # The model client is blocking HTTP; run it off the event
+                # loop so transcription keeps flowing during inference.
+                summaries = await asyncio.to_thread(
+                    self.summarizer.summarize_batch, run_windows
+                )
+            except Exception as e:
+                logger.error("Error generating summary: %s", e)
+                summaries = [""] * len(run_windows)
+
+            for idx, summary in zip(run_indices, summaries):
+                results[idx] = summary
+
+            if summaries[-1]:
+                self._last_window_hash = hash(run_windows[-1])
+                self._last_summary = summaries[-1]
+
+        return results
+
+    def _emit_summary(self, summary: str):
+        """Log a generated summary and forward it to the callback."""
+        logger.info("Generated summary: %s", summary)
+
+        # Call callback if set (for n8n integration)
+        if self.summary_callback:
+            try:
+                self.summary_callback(summary)
+            except Exception as e:
+                logger.error("Error in summary callback: %s", e)
+
+    async def _summary_loop(self):
+        """Background task that generates summaries at regular intervals."""
+        # Schedule against absolute deadlines so the cadence stays at
+        # summary_interval regardless of how long inference takes; a plain
+        # sleep would drift by the inference time every cycle.
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.summary_interval
+
+        while True:
+            remaining = deadline - loop.time()
+            try:
+                await asyncio.wait_for(
+                    self._stop_event.wait(), timeout=max(0, remaining)
+                )
                 break
-            
-            summary = self._generate_summary()
-            
-            if summary:
-                timestamp = datetime.now().isoformat()
-                print(f"\n[{timestamp}] Generated Summary:")
-                print("-" * 60)
-                print(summary)
-                print("-" * 60)
-                
-                # Call callback if set (for n8n integration)
-                if self.summary_callback:
-                    try:
-                        self.summary_callback(summary)
-                    except Exception as e:
-                        print(f"Error in summary callback: {e}")
-    
+            except asyncio.TimeoutError:
+                pass
+
+            deadline += self.summary_interval
+
+            # Snapshot and drain everything queued since the last run so a
+            # backlog of windows becomes a single batched model call.
+            self._queue_current_window()
+            windows = list(self.pending_windows)
+            self.pending_windows.clear()
+
+            for summary in await self._generate_summary(windows):
+                if summary:
+                    self._emit_summary(summary)
+
     def start(self):
-        """Start the periodic summarization thread."""
+        """Start the periodic summarization task on the running event loop."""
         if self.running:
             return
-        
+
         self.running = True
-        self.summary_thread = threading.Thread(target=self._summary_loop, daemon=True)
-        self.summary_thread.start()
-        print(f"Transcript summarizer started (summary interval: {self.summary_interval}s)")
-    
-    def stop(self):
-        """Stop the periodic summarization thread."""
+        self._stop_event.clear()
+        self.summary_task = asyncio.create_task(self._summary_loop())
+        logger.info(
+            "Transcript summarizer started (summary interval: %ss)",
+            self.summary_interval
+        )
+
+    async def stop(self):
+        """Stop the periodic summarization task."""
         self.running = False
-        if self.summary_thread:
-            self.summary_thread.join(timeout=5)
-        print("Transcript summarizer stopped")
-    
+        # Wake the summary task immediately instead of letting it sleep
+        # out the rest of the interval.
+        self._stop_event.set()
+        if self.summary_task:
+            await self.summary_task
+            self.summary_task = None
+        logger.info("Transcript summarizer stopped")
+
     def get_current_transcript(self) -> str:
         """
         Get the current accumulated transcript text.
-        
+
         Returns:
             All transcript text accumulated so far
         """
-        with self.buffer_lock:
-            return " ".join(self.transcript_buffer)
-    
-    def force_summary(self) -> Optional[str]:
+        self._drain_queue()
+        return " ".join(self._window_parts)
+
+    async def force_summary(self) -> Optional[str]:
         """
         Force immediate summary generation from current buffer.
-        
+
         Returns:
             Summary text or None if buffer is empty
         """
-        return self._generate_summary()
+        self._queue_current_window()
+        windows = list(self.pending_windows)
+        self.pending_windows.clear()
+
+        summaries = [s for s in await self._generate_summary(windows) if s]
+        return summaries[-1] if summaries else None
 
 
 # Example usage and testing
@@ -151,17 +239,17 @@ def example_callback(summary: str):
     # requests.post("https://your-n8n-webhook-url", json={"summary": summary})
 
 
-def main():
+async def main():
     """Test the transcript summarizer."""
     print("Initializing Transcript Summarizer...")
-    
+
     # Create summarizer with 30-second interval for testing
     summarizer = TranscriptSummarizer(summary_interval=30)
     summarizer.set_summary_callback(example_callback)
-    
+
     # Start the summarizer
     summarizer.start()
-    
+
     # Simulate adding transcript chunks
     print("\nSimulating transcript input...")
     test_transcripts = [
@@ -175,25 +263,25 @@ def main():
         "We've partnered with three major influencers.",
         "Our social media campaign is already generating buzz.",
     ]
-    
+
     for i, transcript in enumerate(test_transcripts, 1):
         print(f"Adding transcript chunk {i}...")
-        summarizer.add_transcript(transcript)
-        time.sleep(5)  # Simulate real-time input
-    
+        await summarizer.add_transcript(transcript)
+        await asyncio.sleep(5)  # Simulate real-time input
+
     # Wait for summary
-    time.sleep(35)
-    
+    await asyncio.sleep(35)
+
     # Force a summary
     print("\nForcing immediate summary...")
-    summary = summarizer.force_summary()
+    summary = await summarizer.force_summary()
     if summary:
         print(f"\nForced Summary:\n{summary}")
-    
+
     # Stop the summarizer
-    summarizer.stop()
+    await summarizer.stop()
 
 
 if __name__ == "__main__":
-    main()
-
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    asyncio.run(main())